@@ -1,15 +1,26 @@
+import asyncio
+import functools
 import os
+import re
 import sqlite3
+import threading
 import time
-from typing import Optional, List, Tuple
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
+from typing import FrozenSet, Iterator, Optional, List, Tuple
 
 from telegram import (
+    CallbackQuery,
     Update,
     ReplyKeyboardMarkup,
     KeyboardButton,
     InlineKeyboardButton,
     InlineKeyboardMarkup,
+    Message,
 )
+from telegram.error import TelegramError
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -29,45 +40,168 @@ ADMIN_PASSWORD = "admin_password"
 def now_ts() -> int:
     return int(time.time())
 
+# Pure functions of the timestamp; the same activity times are formatted on every render.
+@functools.lru_cache(maxsize=1024)
 def fmt_dt(ts: int) -> str:
     return time.strftime("%Y-%m-%d %H:%M", time.localtime(int(ts)))
 
+@functools.lru_cache(maxsize=1024)
 def fmt_time(ts: int) -> str:
     return time.strftime("%H:%M", time.localtime(int(ts)))
 
+@functools.lru_cache(maxsize=1024)
+def fmt_span(start_ts: int, end_ts: int) -> str:
+    # "YYYY-MM-DD HH:MM-HH:MM", the form every listing row uses; one cache hit per row.
+    return f"{fmt_dt(start_ts)}-{fmt_time(end_ts)}"
+
+# "YYYY-MM-DD HH:MM"; like the strptime format it replaces, single-digit fields and any run of
+# whitespace between date and time are accepted.
+LOCAL_DT_RE = re.compile(r"([0-9]{4})-([0-9]{1,2})-([0-9]{1,2})\s+([0-9]{1,2}):([0-9]{1,2})")
+
 def parse_local_dt(s: str) -> Optional[int]:
+    m = LOCAL_DT_RE.fullmatch(s.strip())
+    if not m:
+        return None
     try:
-        t = time.strptime(s.strip(), "%Y-%m-%d %H:%M")
-        return int(time.mktime(t))  # local time
-    except Exception:
+        return int(datetime(*map(int, m.groups())).timestamp())  # naive, so local time
+    except ValueError:
         return None
 
+# Telegram rejects messages over 4096 characters; leave headroom.
+TG_MESSAGE_LIMIT = 4000
+
+def chunk_lines(lines: List[str], limit: int = TG_MESSAGE_LIMIT) -> List[str]:
+    chunks: List[str] = []
+    cur: List[str] = []
+    size = 0
+    # A single over-long line (e.g. a pasted description) is hard-split so no chunk exceeds the limit.
+    pieces = (line[i:i + limit] for line in lines for i in range(0, len(line) or 1, limit))
+    for line in pieces:
+        if cur and size + len(line) + 1 > limit:
+            chunks.append("\n".join(cur))
+            cur, size = [], 0
+        cur.append(line)
+        size += len(line) + 1
+    if cur:
+        chunks.append("\n".join(cur))
+    return chunks
+
 def get_handle(update: Update) -> Optional[str]:
     u = update.effective_user
     if not u or not u.username:
         return None
     return u.username.lower()
 
+# Handles repeat constantly (every booking, link and callback), so the normalised form is memoised.
+@functools.lru_cache(maxsize=4096)
 def norm_handle(s: str) -> str:
     s = (s or "").strip()
     if s.startswith("@"):
         s = s[1:]
     return s.lower()
 
-def db() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    conn.execute("PRAGMA foreign_keys = ON;")
+# ASCII digits only: str.isdigit() also accepts e.g. "²", which int() then rejects.
+ACT_ID_RE = re.compile(r"#?([0-9]{1,9})")
+
+def parse_act_id(s: str) -> Optional[int]:
+    m = ACT_ID_RE.fullmatch(s)
+    return int(m.group(1)) if m else None
+
+# 1 to 999999, leading zeros allowed.
+CAPACITY_RE = re.compile(r"0*([1-9][0-9]{0,5})")
+
+def parse_capacity(s: str) -> Optional[int]:
+    m = CAPACITY_RE.fullmatch(s)
+    return int(m.group(1)) if m else None
+
+# Long-lived connections (keeps SQLite's page cache warm): one per worker thread for reads,
+# plus a single writer, since SQLite allows only one writer at a time even under WAL.
+_WRITER: Optional[sqlite3.Connection] = None
+_WRITE_LOCK = threading.RLock()
+_READERS = threading.local()
+_OPEN_CONNS: List[sqlite3.Connection] = []
+# Its own lock, so a worker opening its first reader never queues behind a write transaction.
+_CONNS_LOCK = threading.Lock()
+
+def _open_conn() -> sqlite3.Connection:
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False, isolation_level=None, cached_statements=256)
+    with _CONNS_LOCK:
+        _OPEN_CONNS.append(conn)
+    conn.row_factory = sqlite3.Row
+    # Per-connection settings; journal_mode=WAL is persistent and set once in init_db(). The
+    # journal size limit truncates bot.db-wal back to 4 MB after checkpoints instead of letting it
+    # keep its high-water mark.
+    conn.executescript("""
+    PRAGMA foreign_keys = ON;
+    PRAGMA synchronous = NORMAL;
+    PRAGMA temp_store = MEMORY;
+    PRAGMA cache_size = -20000;
+    PRAGMA mmap_size = 134217728;
+    PRAGMA journal_size_limit = 4194304;
+    """)
     return conn
 
+@contextmanager
+def db() -> Iterator[sqlite3.Connection]:
+    """This thread's read connection (autocommit); under WAL it never waits for the writer."""
+    conn = getattr(_READERS, "conn", None)
+    if conn is None:
+        conn = _READERS.conn = _open_conn()
+    yield conn
+
+@contextmanager
+def db_write() -> Iterator[sqlite3.Connection]:
+    """The writer connection, held exclusively for the duration of the block."""
+    global _WRITER
+    with _WRITE_LOCK:
+        if _WRITER is None:
+            _WRITER = _open_conn()
+        yield _WRITER
+
+@contextmanager
+def db_tx() -> Iterator[sqlite3.Connection]:
+    """Writer connection inside BEGIN IMMEDIATE ... COMMIT; rolls back on error."""
+    with db_write() as conn:
+        conn.execute("BEGIN IMMEDIATE;")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK;")
+            raise
+        conn.execute("COMMIT;")
+
+# Bounded pool: each worker keeps its own reader connection, so this also caps open connections.
+DB_WORKERS = 8
+_DB_POOL = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+
+async def run_db(fn, *args, **kwargs):
+    """Run a blocking DB helper off the event loop so other updates keep flowing."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_DB_POOL, functools.partial(fn, *args, **kwargs))
+
+def close_db() -> None:
+    """Drain the DB workers, then close every connection (the last close checkpoints the WAL)."""
+    global _WRITER
+    _DB_POOL.shutdown(wait=True)
+    with _WRITE_LOCK, _CONNS_LOCK:
+        for conn in _OPEN_CONNS:
+            conn.close()
+        _OPEN_CONNS.clear()
+        _WRITER = None
+    _READERS.__dict__.pop("conn", None)
+
+@functools.lru_cache(maxsize=1024)
 def month_key_local(ts: int) -> str:
     lt = time.localtime(int(ts))
     return f"{lt.tm_year:04d}-{lt.tm_mon:02d}"
 
+MONTH_NAMES = ("Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec")
+
+@functools.lru_cache(maxsize=256)
 def month_label(key: str) -> str:
     y, m = key.split("-")
-    month_names = ["Jan","Feb","Mar","Apr","May","Jun","Jul","Aug","Sep","Oct","Nov","Dec"]
     mi = int(m)
-    mn = month_names[mi - 1] if 1 <= mi <= 12 else m
+    mn = MONTH_NAMES[mi - 1] if 1 <= mi <= 12 else m
     return f"{mn} {y}"
 
 # ------------------------
@@ -75,7 +209,12 @@ def month_label(key: str) -> str:
 # ------------------------
 
 def init_db() -> None:
-    with db() as conn:
+    with db_write() as conn:
+        # WAL lets readers proceed while a booking is being written; NORMAL syncs once per checkpoint.
+        conn.execute("PRAGMA journal_mode = WAL;")
+        indexes_before = {
+            r["name"] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index';")
+        }
         conn.executescript("""
         CREATE TABLE IF NOT EXISTS users (
             handle TEXT PRIMARY KEY,
@@ -106,7 +245,8 @@ def init_db() -> None:
             location TEXT,
             start_ts INTEGER NOT NULL,
             end_ts INTEGER NOT NULL,
-            capacity INTEGER NOT NULL
+            capacity INTEGER NOT NULL,
+            booked_count INTEGER NOT NULL DEFAULT 0
         );
 
         CREATE TABLE IF NOT EXISTS bookings (
@@ -122,56 +262,249 @@ def init_db() -> None:
             FOREIGN KEY(individual_handle) REFERENCES individual_profiles(handle) ON DELETE CASCADE,
             FOREIGN KEY(booked_by_handle) REFERENCES users(handle) ON DELETE CASCADE
         );
+
+        -- bookings(activity_id) is already covered by UNIQUE(activity_id, individual_handle),
+        -- caregiver_links(caregiver_handle) by its primary key. The overlap checks walk an
+        -- individual's bookings to their activities, which (individual_handle, activity_id) covers
+        -- without touching the table; it supersedes the older single-column index.
+        DROP INDEX IF EXISTS idx_bookings_individual;
+        CREATE INDEX IF NOT EXISTS idx_bookings_individual_activity ON bookings(individual_handle, activity_id);
+        -- The caregiver view filters on status as well as handle.
+        DROP INDEX IF EXISTS idx_bookings_caregiver;
+        CREATE INDEX IF NOT EXISTS idx_bookings_caregiver_status ON bookings(caregiver_handle, caregiver_status);
+        CREATE INDEX IF NOT EXISTS idx_activities_start ON activities(start_ts);
         """)
 
+        # bot.db files created before booked_count existed: add the column and backfill it once. One
+        # transaction, so a crash can't leave the column in place with zero counts, which later starts
+        # would skip and SQL_BOOK_IF_AVAILABLE would trust.
+        with db_tx() as tx:
+            cols = {r["name"] for r in tx.execute("PRAGMA table_info(activities);")}
+            if "booked_count" not in cols:
+                tx.execute("ALTER TABLE activities ADD COLUMN booked_count INTEGER NOT NULL DEFAULT 0;")
+                tx.execute("""
+                    UPDATE activities
+                    SET booked_count=(SELECT COUNT(*) FROM bookings b WHERE b.activity_id=activities.id);
+                """)
+
+        conn.executescript("""
+        CREATE TRIGGER IF NOT EXISTS bookings_ai AFTER INSERT ON bookings BEGIN
+            UPDATE activities SET booked_count=booked_count+1 WHERE id=NEW.activity_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS bookings_ad AFTER DELETE ON bookings BEGIN
+            UPDATE activities SET booked_count=booked_count-1 WHERE id=OLD.activity_id;
+        END;
+        """)
+
+        # Give the planner statistics for the indexes: full ANALYZE on a fresh file or when an index
+        # was just added, the cheap incremental PRAGMA optimize on later starts.
+        has_stats = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='sqlite_stat1';"
+        ).fetchone()
+        indexes_now = {
+            r["name"] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='index';")
+        }
+        if not has_stats or indexes_now - indexes_before:
+            conn.execute("ANALYZE;")
+        conn.execute("PRAGMA optimize;")
+
 def seed_demo_activities_if_empty() -> None:
-    with db() as conn:
-        (cnt,) = conn.execute("SELECT COUNT(*) FROM activities;").fetchone()
-        if cnt > 0:
-            return
-        base = now_ts() + 3600
-        demo = [
-            ("Music Therapy", "Group music activities", "Room A", base, base + 3600, 10),
-            ("Physio Session", "Guided physio exercises", "Room B", base + 5400, base + 7200, 5),
-        ]
-        conn.executemany(
-            "INSERT INTO activities(title,description,location,start_ts,end_ts,capacity) VALUES (?,?,?,?,?,?);",
-            demo
-        )
+    base = now_ts() + 3600
+    demo = [
+        ("Music Therapy", "Group music activities", "Room A", base, base + 3600, 10),
+        ("Physio Session", "Guided physio exercises", "Room B", base + 5400, base + 7200, 5),
+    ]
+    bulk_insert_activities(demo, only_if_empty=True)
 
 # ------------------------
 # DB ops
 # ------------------------
 
-def user_get(handle: str) -> Optional[Tuple]:
+# Hot queries live here so every call hands sqlite3 the same text and hits its statement cache.
+SQL_USER_GET = "SELECT handle, role, full_name, phone, chat_id FROM users WHERE handle=?;"
+
+# The activity row comes back even with no attendees (booking columns are then NULL).
+SQL_ATTENDANCE_LIST = """
+    SELECT a.title,
+           a.start_ts,
+           a.end_ts,
+           p.name,
+           b.individual_handle,
+           b.caregiver_handle,
+           b.caregiver_status,
+           b.booked_by_handle,
+           b.created_ts
+    FROM activities a
+    LEFT JOIN (bookings b JOIN individual_profiles p ON p.handle=b.individual_handle)
+           ON b.activity_id=a.id
+    WHERE a.id=?
+    ORDER BY LOWER(p.name) ASC, b.individual_handle ASC;
+"""
+
+SQL_CAREGIVER_LINKED = """
+    SELECT p.handle, p.name
+    FROM caregiver_links l
+    JOIN individual_profiles p ON p.handle=l.individual_handle
+    WHERE l.caregiver_handle=?
+    ORDER BY p.name ASC;
+"""
+
+# booked_count is kept up to date by the bookings_ai / bookings_ad triggers.
+SQL_LIST_ACTIVITIES = """
+    SELECT id, title, description, location, start_ts, end_ts, capacity, booked_count
+    FROM activities
+    ORDER BY start_ts ASC, id ASC;
+"""
+
+SQL_ACTIVITY_GET = """
+    SELECT id, title, description, location, start_ts, end_ts, capacity, booked_count
+    FROM activities WHERE id=?;
+"""
+
+# Everything needed to explain a refused booking in one row: no row = activity not found,
+# otherwise the duplicate/full flags and the first clashing booking (NULL title = none).
+SQL_BOOKING_CHECK = """
+    SELECT EXISTS(
+               SELECT 1 FROM bookings WHERE activity_id=n.id AND individual_handle=?
+           ) AS already_booked,
+           n.booked_count >= n.capacity AS is_full,
+           o.title, o.start_ts, o.end_ts
+    FROM activities n
+    LEFT JOIN (bookings b JOIN activities o ON o.id=b.activity_id)
+      ON b.individual_handle=?
+     AND o.start_ts < n.end_ts
+     AND n.start_ts < o.end_ts
+    WHERE n.id=?
+    LIMIT 1;
+"""
+
+# Capacity and overlap are checked in the same statement as the insert, so concurrent
+# bookings cannot both slip past the checks.
+SQL_BOOK_IF_AVAILABLE = """
+    INSERT INTO bookings(activity_id, individual_handle, booked_by_handle, caregiver_handle, caregiver_status, created_ts)
+    SELECT a.id, ?, ?, ?, ?, ?
+    FROM activities a
+    WHERE a.id=?
+      AND a.booked_count < a.capacity
+      AND NOT EXISTS (
+          SELECT 1
+          FROM bookings b
+          JOIN activities o ON o.id=b.activity_id
+          WHERE b.individual_handle=?
+            AND o.start_ts < a.end_ts
+            AND a.start_ts < o.end_ts
+      );
+"""
+
+# One statement for both halves of the caregiver view; each UNION ALL branch uses its own index
+# (bookings by caregiver_handle, caregiver_links by primary key).
+SQL_CAREGIVER_ATTENDANCE = """
+    SELECT 1 AS with_me, p.name, p.handle, a.title, a.start_ts, a.end_ts, b.caregiver_status, a.id
+    FROM bookings b
+    JOIN activities a ON a.id=b.activity_id
+    JOIN individual_profiles p ON p.handle=b.individual_handle
+    WHERE b.caregiver_handle=? AND b.caregiver_status IN ('pending','confirmed')
+    UNION ALL
+    SELECT 0, p.name, p.handle, a.title, a.start_ts, a.end_ts, b.caregiver_status, a.id
+    FROM caregiver_links l
+    JOIN bookings b ON b.individual_handle=l.individual_handle
+    JOIN activities a ON a.id=b.activity_id
+    JOIN individual_profiles p ON p.handle=b.individual_handle
+    WHERE l.caregiver_handle=?
+      AND (b.caregiver_handle IS NULL OR b.caregiver_status='declined')
+    ORDER BY start_ts ASC;
+"""
+
+SQL_BOOKINGS_FOR_INDIVIDUAL = """
+    SELECT a.id, a.title, a.start_ts, a.end_ts, b.caregiver_handle, b.caregiver_status
+    FROM bookings b
+    JOIN activities a ON a.id=b.activity_id
+    WHERE b.individual_handle=?
+    ORDER BY a.start_ts ASC, a.id ASC;
+"""
+
+# handle -> (version, users row, expiry); every write to users goes through the helpers below, which
+# bump the version after COMMIT, so a row read before the write (e.g. the old role just before an
+# admin login) can't be served after it. The TTL bounds how long a role edited directly in bot.db
+# (e.g. a revoked admin) survives.
+USER_CACHE_TTL = 60.0
+_USER_CACHE: dict = {}
+_USER_VER = 0
+
+def users_changed() -> None:
+    # Call after COMMIT, like activities_changed().
+    global _USER_VER
+    with _WRITE_LOCK:
+        _USER_VER += 1
+
+def _user_cache_hit(handle: str) -> Optional[sqlite3.Row]:
+    hit = _USER_CACHE.get(handle)
+    if hit is not None and hit[0] == _USER_VER and hit[2] > time.monotonic():
+        return hit[1]
+    return None
+
+def user_get(handle: str) -> Optional[sqlite3.Row]:
+    row = _user_cache_hit(handle)
+    if row is not None:
+        return row
+    ver = _USER_VER
     with db() as conn:
-        return conn.execute(
-            "SELECT handle, role, full_name, phone, chat_id FROM users WHERE handle=?;",
-            (handle,),
-        ).fetchone()
-
-def admin_attendance_list(activity_id: int) -> List[Tuple]:
+        row = conn.execute(SQL_USER_GET, (handle,)).fetchone()
+    if row is not None:
+        _USER_CACHE[handle] = (ver, row, time.monotonic() + USER_CACHE_TTL)
+    else:
+        _USER_CACHE.pop(handle, None)
+    return row
+
+async def user_get_cached(handle: str) -> Optional[sqlite3.Row]:
+    """user_get for handlers: a fresh cache hit is answered on the event loop, skipping the worker hop."""
+    row = _user_cache_hit(handle)
+    if row is not None:
+        return row
+    return await run_db(user_get, handle)
+
+async def user_role_cached(handle: str) -> Optional[str]:
+    u = await user_get_cached(handle)
+    return u["role"] if u else None
+
+# activity id -> (version, (activity, rows), expiry). The booking writers and profile renames bump
+# the version after COMMIT, so a list read before a write can't be served once it lands. Unknown
+# ids aren't cached, so new activities show up at once.
+ATTEND_CACHE_TTL = 30.0
+_ATTEND_CACHE: dict = {}
+_ATTEND_VER = 0
+
+def attendance_changed() -> None:
+    # Call after COMMIT, like activities_changed().
+    global _ATTEND_VER
+    with _WRITE_LOCK:
+        _ATTEND_VER += 1
+
+def admin_attendance_list(activity_id: int) -> Tuple[Optional[sqlite3.Row], List[sqlite3.Row]]:
     """
-    Returns rows: (individual_name, individual_handle, caregiver_handle, caregiver_status, booked_by_handle, created_ts)
-    Sorted by individual_name.
+    Returns (activity, rows) from one query; activity is None if the id doesn't exist.
+    Rows: (title, start_ts, end_ts, name, individual_handle, caregiver_handle, caregiver_status, booked_by_handle, created_ts)
+    Sorted by name.
     """
+    activity_id = int(activity_id)
+    ver = _ATTEND_VER
+    hit = _ATTEND_CACHE.get(activity_id)
+    if hit is not None and hit[0] == ver and hit[2] > time.monotonic():
+        return hit[1]
     with db() as conn:
-        return conn.execute("""
-            SELECT p.name,
-                   b.individual_handle,
-                   b.caregiver_handle,
-                   b.caregiver_status,
-                   b.booked_by_handle,
-                   b.created_ts
-            FROM bookings b
-            JOIN individual_profiles p ON p.handle=b.individual_handle
-            WHERE b.activity_id=?
-            ORDER BY LOWER(p.name) ASC, b.individual_handle ASC;
-        """, (int(activity_id),)).fetchall()
-
-
-def user_upsert(handle: str, role: str, full_name: str, phone: str, chat_id: Optional[int]) -> None:
-    with db() as conn:
+        rows = conn.execute(SQL_ATTENDANCE_LIST, (activity_id,)).fetchall()
+    if not rows:
+        return None, []
+    result = (rows[0], [r for r in rows if r["individual_handle"] is not None])
+    _ATTEND_CACHE[activity_id] = (ver, result, time.monotonic() + ATTEND_CACHE_TTL)
+    return result
+
+
+def user_upsert(handle: str, role: str, full_name: str, phone: str, chat_id: Optional[int],
+                self_profile: bool = False) -> None:
+    """With self_profile, the individual's own profile row is created (if missing) in the same transaction."""
+    with db_tx() as conn:
         conn.execute("""
             INSERT INTO users(handle, role, full_name, phone, chat_id)
             VALUES (?,?,?,?,?)
@@ -181,42 +514,100 @@ def user_upsert(handle: str, role: str, full_name: str, phone: str, chat_id: Opt
                 phone=excluded.phone,
                 chat_id=excluded.chat_id;
         """, (handle, role, full_name, phone, chat_id))
+        if self_profile:
+            conn.execute("""
+                INSERT INTO individual_profiles(handle, name, created_ts)
+                VALUES (?,?,?)
+                ON CONFLICT(handle) DO NOTHING;
+            """, (norm_handle(handle), (full_name or handle).strip(), now_ts()))
+    users_changed()
 
 def user_set_chat_id(handle: str, chat_id: int) -> None:
-    with db() as conn:
+    # Called on every /start: unregistered handles and unchanged chat ids skip the write lock.
+    u = user_get(handle)
+    if not u or u["chat_id"] == chat_id:
+        return
+    with db_tx() as conn:
         conn.execute("UPDATE users SET chat_id=? WHERE handle=?;", (chat_id, handle))
+    users_changed()
 
-def user_set_role(handle: str, role: str) -> None:
-    with db() as conn:
-        conn.execute("UPDATE users SET role=? WHERE handle=?;", (role, handle))
-
-def individual_profile_upsert(ind_handle: str, name: str) -> None:
-    ind_handle = norm_handle(ind_handle)
-    with db() as conn:
+def user_grant_admin(handle: str, chat_id: int) -> None:
+    # One statement whether or not the handle registered before; an existing name/phone is kept.
+    with db_tx() as conn:
         conn.execute("""
-            INSERT INTO individual_profiles(handle, name, created_ts)
-            VALUES (?,?,?)
+            INSERT INTO users(handle, role, full_name, phone, chat_id)
+            VALUES (?,'admin',?,'',?)
             ON CONFLICT(handle) DO UPDATE SET
-                name=excluded.name;
-        """, (ind_handle, name.strip(), now_ts()))
+                role='admin',
+                chat_id=excluded.chat_id;
+        """, (handle, handle, chat_id))
+    users_changed()
 
-def caregiver_link_add(caregiver_handle: str, individual_handle: str) -> None:
-    with db() as conn:
+SQL_PROFILE_UPSERT = """
+    INSERT INTO individual_profiles(handle, name, created_ts)
+    VALUES (?,?,?)
+    ON CONFLICT(handle) DO UPDATE SET
+        name=excluded.name;
+"""
+
+def individual_profile_upsert(ind_handle: str, name: str) -> None:
+    ind_handle = norm_handle(ind_handle)
+    with db_tx() as conn:
+        conn.execute(SQL_PROFILE_UPSERT, (ind_handle, name.strip(), now_ts()))
+    # Names appear in every linked caregiver's cached list and in attendance lists.
+    links_changed()
+    attendance_changed()
+
+def caregiver_link_add(caregiver_handle: str, individual_handle: str, ind_name: Optional[str] = None) -> None:
+    """With ind_name, the individual's profile is upserted in the same transaction as the link."""
+    cg, ind = norm_handle(caregiver_handle), norm_handle(individual_handle)
+    with db_tx() as conn:
+        if ind_name is not None:
+            conn.execute(SQL_PROFILE_UPSERT, (ind, ind_name.strip(), now_ts()))
         conn.execute("""
             INSERT OR IGNORE INTO caregiver_links(caregiver_handle, individual_handle)
             VALUES (?,?);
-        """, (norm_handle(caregiver_handle), norm_handle(individual_handle)))
+        """, (cg, ind))
+    links_changed()
+    if ind_name is not None:
+        attendance_changed()
+
+# caregiver handle -> (version, [(handle, name), ...], frozenset of handles). An entry is only
+# served while its version is current, so a roster read before a write commits can't outlive it.
+_LINKED_CACHE: dict = {}
+_LINKED_VER = 0
+
+def links_changed() -> None:
+    # Call after COMMIT, like activities_changed().
+    global _LINKED_VER
+    with _WRITE_LOCK:
+        _LINKED_VER += 1
+
+def _caregiver_links(caregiver_handle: str) -> Tuple[List[Tuple[str, str]], FrozenSet[str]]:
+    cg = norm_handle(caregiver_handle)
+    ver = _LINKED_VER
+    hit = _LINKED_CACHE.get(cg)
+    if hit is None or hit[0] != ver:
+        with db() as conn:
+            rows = conn.execute(SQL_CAREGIVER_LINKED, (cg,)).fetchall()
+        people = [(r["handle"], r["name"]) for r in rows]
+        hit = _LINKED_CACHE[cg] = (ver, people, frozenset(h for h, _ in people))
+    return hit[1], hit[2]
 
 def caregiver_linked_individuals(caregiver_handle: str) -> List[Tuple[str, str]]:
+    return _caregiver_links(caregiver_handle)[0]
+
+def caregiver_is_linked(caregiver_handle: str, individual_handle: str) -> bool:
+    cg, ind = norm_handle(caregiver_handle), norm_handle(individual_handle)
+    hit = _LINKED_CACHE.get(cg)
+    if hit is not None and hit[0] == _LINKED_VER:
+        return ind in hit[2]
+    # Cold cache: a primary-key probe answers this without loading the whole roster.
     with db() as conn:
-        rows = conn.execute("""
-            SELECT p.handle, p.name
-            FROM caregiver_links l
-            JOIN individual_profiles p ON p.handle=l.individual_handle
-            WHERE l.caregiver_handle=?
-            ORDER BY p.name ASC;
-        """, (norm_handle(caregiver_handle),)).fetchall()
-        return [(r[0], r[1]) for r in rows]
+        return conn.execute(
+            "SELECT 1 FROM caregiver_links WHERE caregiver_handle=? AND individual_handle=?;",
+            (cg, ind),
+        ).fetchone() is not None
 
 def ensure_self_individual_profile(handle: str, name_fallback: str) -> str:
     h = norm_handle(handle)
@@ -227,172 +618,194 @@ def ensure_self_individual_profile(handle: str, name_fallback: str) -> str:
     individual_profile_upsert(h, name_fallback or h)
     return h
 
-def list_activities() -> List[Tuple]:
+# Activity rows change only through the helpers that call activities_changed(); the TTL is a
+# backstop for edits made to bot.db from outside the process.
+ACT_CACHE_TTL = 5.0
+_ACT_CACHE: dict = {
+    "ver": 0, "rows_ver": -1, "rows": None, "ts": 0.0,
+    "kb_rows": None, "kb": None,
+    "months": (None, None),  # (rows it was grouped from, grouping), swapped in as one value
+}
+
+def activities_changed() -> None:
+    # Call after COMMIT: a reader that fetched pre-commit rows then caches them under the old
+    # version. The lock keeps concurrent writers' bumps from collapsing into one.
+    with _WRITE_LOCK:
+        _ACT_CACHE["ver"] += 1
+
+def list_activities() -> List[sqlite3.Row]:
+    c = _ACT_CACHE
+    if c["rows_ver"] == c["ver"] and time.monotonic() - c["ts"] < ACT_CACHE_TTL:
+        return c["rows"]
+    ver = c["ver"]
     with db() as conn:
-        return conn.execute("""
-            SELECT id, title, description, location, start_ts, end_ts, capacity,
-                   (SELECT COUNT(*) FROM bookings b WHERE b.activity_id=activities.id) AS booked
-            FROM activities
-            ORDER BY start_ts ASC, id ASC;
-        """).fetchall()
-
-def activity_get(act_id: int) -> Optional[Tuple]:
+        rows = conn.execute(SQL_LIST_ACTIVITIES).fetchall()
+    c.update(rows=rows, rows_ver=ver, ts=time.monotonic())
+    return rows
+
+def activity_get(act_id: int) -> Optional[sqlite3.Row]:
     with db() as conn:
-        return conn.execute("""
-            SELECT id, title, description, location, start_ts, end_ts, capacity,
-                   (SELECT COUNT(*) FROM bookings b WHERE b.activity_id=activities.id) AS booked
-            FROM activities WHERE id=?;
-        """, (int(act_id),)).fetchone()
-
-def capacity_available(act_id: int) -> bool:
-    row = activity_get(act_id)
-    if not row:
-        return False
-    cap, booked = int(row[6]), int(row[7])
-    return booked < cap
+        return conn.execute(SQL_ACTIVITY_GET, (int(act_id),)).fetchone()
+
+def booking_refusal(individual_handle: str, act_id: int) -> Optional[str]:
+    """Why a booking can't be made, or None if it can."""
+    h = norm_handle(individual_handle)
+    with db() as conn:
+        row = conn.execute(SQL_BOOKING_CHECK, (h, h, int(act_id))).fetchone()
 
-def booking_conflict(individual_handle: str, act_id: int) -> Optional[str]:
-    row = activity_get(act_id)
     if not row:
         return "Activity not found."
-    new_start, new_end = int(row[4]), int(row[5])
-
-    with db() as conn:
-        hit = conn.execute("""
-            SELECT a.title, a.start_ts, a.end_ts
-            FROM bookings b
-            JOIN activities a ON a.id=b.activity_id
-            WHERE b.individual_handle=?
-              AND a.start_ts < ?
-              AND ? < a.end_ts
-            LIMIT 1;
-        """, (norm_handle(individual_handle), new_end, new_start)).fetchone()
-
-    if not hit:
-        return None
-    title, s, e = hit
-    return f"Conflicts with {title} ({fmt_dt(int(s))}-{fmt_time(int(e))})"
+    if row["already_booked"]:
+        return "Already booked."
+    if row["is_full"]:
+        return "Activity is full."
+    if row["title"] is not None:
+        return f"Conflicts with {row['title']} ({fmt_span(row['start_ts'], row['end_ts'])})"
+    return None
 
 def create_booking(activity_id: int, individual_handle: str, booked_by: str,
                    caregiver_handle: Optional[str], caregiver_status: Optional[str]) -> Tuple[bool, str]:
-    if not capacity_available(activity_id):
-        return False, "Activity is full."
-    conflict = booking_conflict(individual_handle, activity_id)
-    if conflict:
-        return False, conflict
-
-    with db() as conn:
+    ind_handle = norm_handle(individual_handle)
+    with db_tx() as conn:
         try:
-            conn.execute("""
-                INSERT INTO bookings(activity_id, individual_handle, booked_by_handle, caregiver_handle, caregiver_status, created_ts)
-                VALUES (?,?,?,?,?,?);
-            """, (
-                int(activity_id),
-                norm_handle(individual_handle),
+            cur = conn.execute(SQL_BOOK_IF_AVAILABLE, (
+                ind_handle,
                 norm_handle(booked_by),
                 norm_handle(caregiver_handle) if caregiver_handle else None,
                 caregiver_status,
-                now_ts()
+                now_ts(),
+                int(activity_id),
+                ind_handle,
             ))
-            return True, "Booked successfully."
         except sqlite3.IntegrityError:
             return False, "Already booked."
-
-def update_booking_caregiver(activity_id: int, individual_handle: str, caregiver_handle: str) -> None:
-    with db() as conn:
+        if cur.rowcount != 1:
+            # Nothing inserted: only now pay for the one query that explains why.
+            return False, booking_refusal(ind_handle, activity_id) or "Already booked."
+    # After COMMIT, so a concurrent read can't re-cache the pre-booking rows.
+    activities_changed()
+    attendance_changed()
+    return True, "Booked successfully."
+
+def caregiver_create_booking(activity_id: int, individual_handle: str, caregiver_handle: str) -> Tuple[bool, str]:
+    # Ownership check and booking share one worker hop; the caregiver attends, already confirmed.
+    if not caregiver_is_linked(caregiver_handle, individual_handle):
+        return False, "You can only book for individuals linked to your caregiver account."
+    return create_booking(activity_id, individual_handle, caregiver_handle, caregiver_handle, "confirmed")
+
+def update_booking_caregiver(activity_id: int, individual_handle: str,
+                             caregiver_handle: str) -> Optional[sqlite3.Row]:
+    """Returns the activity row, which the caller needs for the caregiver's notification."""
+    with db_tx() as conn:
         conn.execute("""
             UPDATE bookings
             SET caregiver_handle=?, caregiver_status='pending'
             WHERE activity_id=? AND individual_handle=?;
         """, (norm_handle(caregiver_handle), int(activity_id), norm_handle(individual_handle)))
+    attendance_changed()
+    return activity_get(activity_id)
 
 def update_caregiver_status(activity_id: int, individual_handle: str, caregiver_handle: str, status: str) -> None:
-    with db() as conn:
+    with db_tx() as conn:
         conn.execute("""
             UPDATE bookings
             SET caregiver_status=?
             WHERE activity_id=? AND individual_handle=? AND caregiver_handle=?;
         """, (status, int(activity_id), norm_handle(individual_handle), norm_handle(caregiver_handle)))
+    attendance_changed()
 
-def list_bookings_for_individual(ind_handle: str) -> List[Tuple]:
+def list_bookings_for_individual(ind_handle: str) -> List[sqlite3.Row]:
     with db() as conn:
-        return conn.execute("""
-            SELECT a.id, a.title, a.start_ts, a.end_ts, b.caregiver_handle, b.caregiver_status
-            FROM bookings b
-            JOIN activities a ON a.id=b.activity_id
-            WHERE b.individual_handle=?
-            ORDER BY a.start_ts ASC, a.id ASC;
-        """, (norm_handle(ind_handle),)).fetchall()
+        return conn.execute(SQL_BOOKINGS_FOR_INDIVIDUAL, (norm_handle(ind_handle),)).fetchall()
 
 def cancel_booking(activity_id: int, individual_handle: str) -> bool:
-    with db() as conn:
+    with db_tx() as conn:
         cur = conn.execute("""
             DELETE FROM bookings WHERE activity_id=? AND individual_handle=?;
         """, (int(activity_id), norm_handle(individual_handle)))
-        return cur.rowcount > 0
+    if cur.rowcount == 0:
+        return False
+    activities_changed()
+    attendance_changed()
+    return True
 
-def caregiver_view_attendance(caregiver_handle: str) -> Tuple[List[Tuple], List[Tuple]]:
+def caregiver_view_attendance(caregiver_handle: str) -> Tuple[List[sqlite3.Row], List[sqlite3.Row]]:
+    """
+    Returns (with_me, without_me); rows: (with_me, name, handle, title, start_ts, end_ts, caregiver_status, id)
+    Both come from one query and are split on the with_me flag.
+    """
     caregiver_handle = norm_handle(caregiver_handle)
     with db() as conn:
-        with_me = conn.execute("""
-            SELECT p.name, p.handle, a.title, a.start_ts, a.end_ts, b.caregiver_status, a.id
-            FROM bookings b
-            JOIN activities a ON a.id=b.activity_id
-            JOIN individual_profiles p ON p.handle=b.individual_handle
-            WHERE b.caregiver_handle=? AND b.caregiver_status IN ('pending','confirmed')
-            ORDER BY a.start_ts ASC;
-        """, (caregiver_handle,)).fetchall()
-
-        without_me = conn.execute("""
-            SELECT p.name, p.handle, a.title, a.start_ts, a.end_ts, a.id
-            FROM bookings b
-            JOIN activities a ON a.id=b.activity_id
-            JOIN individual_profiles p ON p.handle=b.individual_handle
-            JOIN caregiver_links l ON l.individual_handle=p.handle
-            WHERE l.caregiver_handle=?
-              AND (b.caregiver_handle IS NULL OR b.caregiver_status='declined')
-            ORDER BY a.start_ts ASC;
-        """, (caregiver_handle,)).fetchall()
-
+        rows = conn.execute(SQL_CAREGIVER_ATTENDANCE, (caregiver_handle, caregiver_handle)).fetchall()
+    with_me = [r for r in rows if r["with_me"]]
+    without_me = [r for r in rows if not r["with_me"]]
     return with_me, without_me
 
 def admin_add_activity(title: str, description: str, location: str, start_ts: int, end_ts: int, capacity: int) -> int:
-    with db() as conn:
+    with db_tx() as conn:
         cur = conn.execute("""
             INSERT INTO activities(title,description,location,start_ts,end_ts,capacity)
             VALUES (?,?,?,?,?,?);
         """, (title.strip(), description.strip(), location.strip(), int(start_ts), int(end_ts), int(capacity)))
-        return int(cur.lastrowid)
+    activities_changed()
+    return int(cur.lastrowid)
+
+def bulk_insert_activities(rows: List[Tuple], only_if_empty: bool = False) -> bool:
+    """
+    rows: (title, description, location, start_ts, end_ts, capacity)
+    All rows go in under one BEGIN IMMEDIATE ... COMMIT, i.e. a single sync instead of one per row.
+    With only_if_empty, the emptiness check runs in that same transaction; returns whether rows went in.
+    """
+    with db_tx() as conn:
+        if only_if_empty and conn.execute("SELECT EXISTS(SELECT 1 FROM activities);").fetchone()[0]:
+            return False
+        conn.executemany("""
+            INSERT INTO activities(title,description,location,start_ts,end_ts,capacity)
+            VALUES (?,?,?,?,?,?);
+        """, rows)
+    activities_changed()
+    return True
 
-def list_upcoming_month_keys() -> List[str]:
+def _activities_by_month() -> dict:
+    """month key -> that month's activities, in list order; regrouped only when the rows change."""
     acts = list_activities()
-    keys = []
-    seen = set()
+    # Runs on several pool threads: a single tuple store means a grouping is never paired with
+    # rows other than the ones it was built from.
+    rows, months = _ACT_CACHE["months"]
+    if rows is not acts:
+        months = {}
+        for a in acts:
+            months.setdefault(month_key_local(a["start_ts"]), []).append(a)
+        _ACT_CACHE["months"] = (acts, months)
+    return months
+
+def list_upcoming_month_keys() -> Tuple[str, ...]:
+    # Rows are sorted by start_ts, so a month is upcoming iff its last activity hasn't started yet.
+    # A tuple, so admin_months_kb() can memoise on it.
     cur = now_ts()
-    for a in acts:
-        start_ts = int(a[4])
-        if start_ts < cur:
-            continue
-        k = month_key_local(start_ts)
-        if k not in seen:
-            seen.add(k)
-            keys.append(k)
-    return keys
-
-def activities_in_month(month_key: str) -> List[Tuple]:
-    acts = list_activities()
-    out = []
-    for a in acts:
-        start_ts = int(a[4])
-        if month_key_local(start_ts) == month_key:
-            out.append(a)
-    out.sort(key=lambda x: (int(x[4]), int(x[0])))
-    return out
+    return tuple(k for k, acts in _activities_by_month().items() if acts[-1]["start_ts"] >= cur)
+
+def activities_in_month(month_key: str) -> List[sqlite3.Row]:
+    return _activities_by_month().get(month_key, [])
 
 # ------------------------
 # UI
 # ------------------------
 
+def caregiver_part(cg_handle: Optional[str], cg_status: Optional[str]) -> str:
+    return f" | caregiver @{cg_handle} ({cg_status})" if cg_handle else ""
+
+@functools.lru_cache(maxsize=1024)
+def fmt_activity_detail(act: sqlite3.Row) -> str:
+    # The row carries the booked count, so a new booking naturally misses the cache.
+    return (
+        f"#{act['id']} — {act['title']}\n"
+        f"🕒 {fmt_dt(act['start_ts'])}–{fmt_time(act['end_ts'])}\n"
+        f"📍 {act['location'] or '-'}\n"
+        f"📝 {act['description'] or '-'}\n"
+        f"👥 {act['booked_count']}/{act['capacity']}"
+    )
+
 def main_menu_keyboard() -> ReplyKeyboardMarkup:
     kb = [
         [KeyboardButton("📝 Register / Update Profile")],
@@ -403,6 +816,16 @@ def main_menu_keyboard() -> ReplyKeyboardMarkup:
     ]
     return ReplyKeyboardMarkup(kb, resize_keyboard=True)
 
+# The main menu is the same for everyone; build it once and share it across replies.
+MAIN_MENU_KB = main_menu_keyboard()
+
+# Replies shared by several handlers.
+MSG_NOT_AUTHORISED = "Not authorised."
+MSG_REGISTER_FIRST = "Register first."
+MSG_REGISTER_FIRST_TAP = "Register first (tap Register)."
+MSG_BAD_ACT_ID = "Enter a numeric activity id (e.g., 1)."
+MSG_BAD_DATETIME = "Invalid format. Use YYYY-MM-DD HH:MM"
+
 def register_role_keyboard() -> ReplyKeyboardMarkup:
     kb = [
         [KeyboardButton("🙋 Individual"), KeyboardButton("🧑‍🦽 Caregiver")],
@@ -419,14 +842,24 @@ def admin_panel_keyboard() -> ReplyKeyboardMarkup:
     ]
     return ReplyKeyboardMarkup(kb, resize_keyboard=True)
 
-def activities_name_list_kb(acts: List[Tuple]) -> InlineKeyboardMarkup:
+def activities_name_list_kb(acts: List[sqlite3.Row]) -> InlineKeyboardMarkup:
     rows = []
     for a in acts:
-        act_id, title, start_ts = int(a[0]), a[1], int(a[4])
+        act_id, title, start_ts = a["id"], a["title"], a["start_ts"]
         label = f"{title} • {fmt_dt(start_ts)}"
         rows.append([InlineKeyboardButton(label, callback_data=f"ACT|{act_id}")])
     return InlineKeyboardMarkup(rows)
 
+def activities_menu_kb(acts: List[sqlite3.Row]) -> InlineKeyboardMarkup:
+    # list_activities() hands back the same list object until the cache is invalidated,
+    # so identity tells us whether the markup built last time is still current.
+    c = _ACT_CACHE
+    if c["kb_rows"] is not acts:
+        c["kb"] = activities_name_list_kb(acts)
+        c["kb_rows"] = acts
+    return c["kb"]
+
+@functools.lru_cache(maxsize=256)
 def activity_detail_kb(act_id: int) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup([
         [InlineKeyboardButton("✅ Book", callback_data=f"BOOK|{act_id}")],
@@ -439,8 +872,7 @@ def yesno_kb(prefix: str) -> InlineKeyboardMarkup:
          InlineKeyboardButton("No", callback_data=f"{prefix}|NO")]
     ])
 
-def caregiver_pick_individual_kb(caregiver_handle: str, activity_id: int) -> InlineKeyboardMarkup:
-    people = caregiver_linked_individuals(caregiver_handle)
+def caregiver_pick_individual_kb(people: List[Tuple[str, str]], activity_id: int) -> InlineKeyboardMarkup:
     rows = []
     for h, name in people:
         rows.append([InlineKeyboardButton(f"{name} (@{h})", callback_data=f"CGBOOK|{activity_id}|{h}")])
@@ -455,7 +887,8 @@ def caregiver_confirm_kb(activity_id: int, individual_handle: str) -> InlineKeyb
         ]
     ])
 
-def admin_months_kb(keys: List[str]) -> InlineKeyboardMarkup:
+@functools.lru_cache(maxsize=64)
+def admin_months_kb(keys: Tuple[str, ...]) -> InlineKeyboardMarkup:
     buttons = [InlineKeyboardButton(month_label(k), callback_data=f"ADM_MONTH|{k}") for k in keys]
     rows = []
     for i in range(0, len(buttons), 2):
@@ -468,26 +901,62 @@ def admin_back_to_months_kb() -> InlineKeyboardMarkup:
         [InlineKeyboardButton("⬅️ Back to months", callback_data="ADM_MONTHS|LIST")]
     ])
 
+# The fixed layouts, built once like MAIN_MENU_KB; markup objects are immutable, so sharing is safe.
+REGISTER_ROLE_KB = register_role_keyboard()
+ADMIN_PANEL_KB = admin_panel_keyboard()
+ADMIN_BACK_TO_MONTHS_KB = admin_back_to_months_kb()
+INDCG_YESNO_KB = yesno_kb("INDCG")
+
 # ------------------------
 # Handlers
 # ------------------------
 
+async def reply_lines(update: Update, lines: List[str], reply_markup=None) -> None:
+    # Chunks go out one after another so they arrive in order; the keyboard rides on the last one.
+    reply = update.message.reply_text
+    chunks = chunk_lines(lines)
+    for i, chunk in enumerate(chunks):
+        await reply(chunk, reply_markup=reply_markup if i == len(chunks) - 1 else None)
+
+async def edit_text(q: CallbackQuery, text: str, reply_markup: Optional[InlineKeyboardMarkup] = None) -> None:
+    # A re-tapped button often asks for exactly what is already on screen; Telegram would spend a
+    # round trip answering "message is not modified", so compare against the message we were sent.
+    # q.message may be an InaccessibleMessage (too old), which has neither field; just try the edit.
+    m = q.message
+    if isinstance(m, Message) and m.text == text and m.reply_markup == reply_markup:
+        return
+    await q.edit_message_text(text, reply_markup=reply_markup)
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    reply = update.message.reply_text
     handle = get_handle(update)
     if not handle:
-        await update.message.reply_text("Set a Telegram username first (Settings → Username), then /start again.")
+        await reply("Set a Telegram username first (Settings → Username), then /start again.")
         return
 
-    chat_id = update.effective_chat.id
-    if user_get(handle):
-        user_set_chat_id(handle, chat_id)
+    await run_db(user_set_chat_id, handle, update.effective_chat.id)
+    await reply("Menu:", reply_markup=MAIN_MENU_KB)
 
-    await update.message.reply_text("Menu:", reply_markup=main_menu_keyboard())
+# Updates are handled concurrently (block=False), but wizard steps await the DB before advancing
+# context.user_data["awaiting"]; one lock per chat keeps a user's messages in arrival order.
+# Entries disappear once no handler holds the lock.
+_CHAT_LOCKS: "weakref.WeakValueDictionary[int, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+def chat_lock(chat_id: int) -> asyncio.Lock:
+    lock = _CHAT_LOCKS.get(chat_id)
+    if lock is None:
+        lock = _CHAT_LOCKS[chat_id] = asyncio.Lock()
+    return lock
 
 async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    async with chat_lock(update.effective_chat.id):
+        await _handle_text(update, context)
+
+async def _handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    reply = update.message.reply_text
     handle = get_handle(update)
     if not handle:
-        await update.message.reply_text("Set a Telegram username first (Settings → Username).")
+        await reply("Set a Telegram username first (Settings → Username).")
         return
 
     text = (update.message.text or "").strip()
@@ -496,7 +965,7 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 
     if text == "⬅️ Back":
         context.user_data.clear()
-        await update.message.reply_text("Menu:", reply_markup=main_menu_keyboard())
+        await reply("Menu:", reply_markup=MAIN_MENU_KB)
         return
 
     if context.user_data.get("awaiting") == "REG_ROLE":
@@ -506,12 +975,12 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         elif "caregiver" in lower:
             role = "caregiver"
         else:
-            await update.message.reply_text("Choose role:", reply_markup=register_role_keyboard())
+            await reply("Choose role:", reply_markup=REGISTER_ROLE_KB)
             return
 
         context.user_data["tmp"] = {"role": role}
         context.user_data["awaiting"] = "REG_NAME"
-        await update.message.reply_text("Type your full name (one time):", reply_markup=main_menu_keyboard())
+        await reply("Type your full name (one time):", reply_markup=MAIN_MENU_KB)
         return
 
     if awaiting:
@@ -520,520 +989,529 @@ async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
 
     if text == "📝 Register / Update Profile":
         context.user_data["awaiting"] = "REG_ROLE"
-        await update.message.reply_text("Choose role:", reply_markup=register_role_keyboard())
+        await reply("Choose role:", reply_markup=REGISTER_ROLE_KB)
         return
 
     if text == "📅 Activities":
-        u = user_get(handle)
+        u = await user_get_cached(handle)
         if not u:
-            await update.message.reply_text("Register first (tap Register).", reply_markup=main_menu_keyboard())
+            await reply(MSG_REGISTER_FIRST_TAP, reply_markup=MAIN_MENU_KB)
             return
-        acts = list_activities()
+        acts = await run_db(list_activities)
         if not acts:
-            await update.message.reply_text("No activities available.", reply_markup=main_menu_keyboard())
+            await reply("No activities available.", reply_markup=MAIN_MENU_KB)
             return
-        await update.message.reply_text("Select an activity to view details:", reply_markup=main_menu_keyboard())
-        await update.message.reply_text("Activities:", reply_markup=activities_name_list_kb(acts))
+        await reply("Select an activity to view details:", reply_markup=MAIN_MENU_KB)
+        await reply("Activities:", reply_markup=activities_menu_kb(acts))
         return
 
     if text == "📋 Attendance List":
-        u = user_get(handle)
-        if not u or u[1] != "admin":
-            await update.message.reply_text("Not authorised.", reply_markup=main_menu_keyboard())
+        if await user_role_cached(handle) != "admin":
+            await reply(MSG_NOT_AUTHORISED, reply_markup=MAIN_MENU_KB)
             return
         context.user_data["awaiting"] = "ADM_ATTEND_ID"
-        await update.message.reply_text("Enter activity id to generate attendance list (e.g., 1):", reply_markup=admin_panel_keyboard())
+        await reply("Enter activity id to generate attendance list (e.g., 1):", reply_markup=ADMIN_PANEL_KB)
         return
 
     
     if text == "✅ My Bookings":
-        u = user_get(handle)
+        u = await user_get_cached(handle)
         if not u:
-            await update.message.reply_text("Register first.", reply_markup=main_menu_keyboard())
+            await reply(MSG_REGISTER_FIRST, reply_markup=MAIN_MENU_KB)
             return
-        if u[1] != "individual":
-            await update.message.reply_text("This view is for individuals. Caregivers use 'Caregiver: My Attendance'.", reply_markup=main_menu_keyboard())
+        if u["role"] != "individual":
+            await reply("This view is for individuals. Caregivers use 'Caregiver: My Attendance'.", reply_markup=MAIN_MENU_KB)
             return
-        ind_handle = ensure_self_individual_profile(handle, u[2] or handle)
-        rows = list_bookings_for_individual(ind_handle)
+        ind_handle = await run_db(ensure_self_individual_profile, handle, u["full_name"] or handle)
+        rows = await run_db(list_bookings_for_individual, ind_handle)
         if not rows:
-            await update.message.reply_text("No bookings yet.", reply_markup=main_menu_keyboard())
+            await reply("No bookings yet.", reply_markup=MAIN_MENU_KB)
             return
         lines = ["Your bookings:"]
-        for act_id, title, s, e, cg, cg_status in rows:
-            cg_part = ""
-            if cg:
-                cg_part = f" | caregiver @{cg} ({cg_status})"
-            lines.append(f"- #{act_id} {title} ({fmt_dt(int(s))}-{fmt_time(int(e))}){cg_part}")
-        await update.message.reply_text("\n".join(lines), reply_markup=main_menu_keyboard())
+        lines.extend(
+            f"- #{r['id']} {r['title']} ({fmt_span(r['start_ts'], r['end_ts'])})"
+            f"{caregiver_part(r['caregiver_handle'], r['caregiver_status'])}"
+            for r in rows
+        )
+        await reply_lines(update, lines, reply_markup=MAIN_MENU_KB)
         return
 
     if text == "❌ Cancel Booking":
-        u = user_get(handle)
+        u = await user_get_cached(handle)
         if not u:
-            await update.message.reply_text("Register first.", reply_markup=main_menu_keyboard())
+            await reply(MSG_REGISTER_FIRST, reply_markup=MAIN_MENU_KB)
             return
-        if u[1] != "individual":
-            await update.message.reply_text("Cancel is implemented for individuals only in this version.", reply_markup=main_menu_keyboard())
+        if u["role"] != "individual":
+            await reply("Cancel is implemented for individuals only in this version.", reply_markup=MAIN_MENU_KB)
             return
         context.user_data["awaiting"] = "CANCEL_ACT_ID"
-        await update.message.reply_text("Enter activity id to cancel (e.g., 1):", reply_markup=main_menu_keyboard())
+        await reply("Enter activity id to cancel (e.g., 1):", reply_markup=MAIN_MENU_KB)
         return
 
     if text == "👥 Caregiver: My Attendance":
-        u = user_get(handle)
-        if not u or u[1] != "caregiver":
-            await update.message.reply_text("This is for caregiver accounts only.", reply_markup=main_menu_keyboard())
+        if await user_role_cached(handle) != "caregiver":
+            await reply("This is for caregiver accounts only.", reply_markup=MAIN_MENU_KB)
             return
-        with_me, without_me = caregiver_view_attendance(handle)
+        with_me, without_me = await run_db(caregiver_view_attendance, handle)
 
         out = []
         out.append("Events you are attending with your individual (pending/confirmed):")
         if not with_me:
             out.append("- (none)")
         else:
-            for name, ih, title, s, e, status, act_id in with_me:
-                out.append(f"- #{act_id} {title} | {name} (@{ih}) | {fmt_dt(int(s))}-{fmt_time(int(e))} | {status}")
+            for r in with_me:
+                out.append(
+                    f"- #{r['id']} {r['title']} | {r['name']} (@{r['handle']}) | "
+                    f"{fmt_span(r['start_ts'], r['end_ts'])} | {r['caregiver_status']}"
+                )
 
         out.append("")
         out.append("Events your linked individuals are attending without you:")
         if not without_me:
             out.append("- (none)")
         else:
-            for name, ih, title, s, e, act_id in without_me:
-                out.append(f"- #{act_id} {title} | {name} (@{ih}) | {fmt_dt(int(s))}-{fmt_time(int(e))}")
+            for r in without_me:
+                out.append(
+                    f"- #{r['id']} {r['title']} | {r['name']} (@{r['handle']}) | "
+                    f"{fmt_span(r['start_ts'], r['end_ts'])}"
+                )
 
-        await update.message.reply_text("\n".join(out), reply_markup=main_menu_keyboard())
+        await reply_lines(update, out, reply_markup=MAIN_MENU_KB)
         return
 
     if text == "🔐 Admin Login":
         context.user_data["awaiting"] = "ADMIN_PASSWORD"
-        await update.message.reply_text("Enter admin password:")
+        await reply("Enter admin password:")
         return
 
     if text == "🛠 Admin Panel":
-        u = user_get(handle)
-        if not u or u[1] != "admin":
-            await update.message.reply_text("Not authorised. Tap Admin Login first.", reply_markup=main_menu_keyboard())
+        if await user_role_cached(handle) != "admin":
+            await reply("Not authorised. Tap Admin Login first.", reply_markup=MAIN_MENU_KB)
             return
-        await update.message.reply_text("Admin Panel:", reply_markup=admin_panel_keyboard())
+        await reply("Admin Panel:", reply_markup=ADMIN_PANEL_KB)
         return
 
     if text == "➕ Add Event":
-        u = user_get(handle)
-        if not u or u[1] != "admin":
-            await update.message.reply_text("Not authorised.", reply_markup=main_menu_keyboard())
+        if await user_role_cached(handle) != "admin":
+            await reply(MSG_NOT_AUTHORISED, reply_markup=MAIN_MENU_KB)
             return
         context.user_data["awaiting"] = "ADM_TITLE"
         context.user_data["tmp"] = {}
-        await update.message.reply_text("Event title:", reply_markup=admin_panel_keyboard())
+        await reply("Event title:", reply_markup=ADMIN_PANEL_KB)
         return
 
     if text == "📆 View Events by Month":
-        u = user_get(handle)
-        if not u or u[1] != "admin":
-            await update.message.reply_text("Not authorised.", reply_markup=main_menu_keyboard())
+        if await user_role_cached(handle) != "admin":
+            await reply(MSG_NOT_AUTHORISED, reply_markup=MAIN_MENU_KB)
             return
-        keys = list_upcoming_month_keys()
+        keys = await run_db(list_upcoming_month_keys)
         if not keys:
-            await update.message.reply_text("No upcoming events.", reply_markup=admin_panel_keyboard())
+            await reply("No upcoming events.", reply_markup=ADMIN_PANEL_KB)
             return
-        await update.message.reply_text("Select a month:", reply_markup=admin_panel_keyboard())
-        await update.message.reply_text("Months:", reply_markup=admin_months_kb(keys))
+        await reply("Select a month:", reply_markup=ADMIN_PANEL_KB)
+        await reply("Months:", reply_markup=admin_months_kb(keys))
         return
 
-    await update.message.reply_text("Use /start and the menu buttons.", reply_markup=main_menu_keyboard())
+    await reply("Use /start and the menu buttons.", reply_markup=MAIN_MENU_KB)
 
 async def handle_wizard_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    handle = get_handle(update)
-    chat_id = update.effective_chat.id
-    msg = (update.message.text or "").strip()
-    awaiting = context.user_data.get("awaiting")
-    tmp = context.user_data.get("tmp", {})
-
-    if awaiting == "ADMIN_PASSWORD":
-        if msg == ADMIN_PASSWORD:
-            existing = user_get(handle)
-            if not existing:
-                user_upsert(handle, "admin", handle, "", chat_id)
-            else:
-                user_set_role(handle, "admin")
-                user_set_chat_id(handle, chat_id)
-            context.user_data.clear()
-            await update.message.reply_text("Admin access granted. Tap Admin Panel.", reply_markup=main_menu_keyboard())
-        else:
-            context.user_data.clear()
-            await update.message.reply_text("Wrong password.", reply_markup=main_menu_keyboard())
+    handler = WIZARD_HANDLERS.get(context.user_data.get("awaiting"))
+    if handler is None:
+        context.user_data.clear()
+        await update.message.reply_text("Flow reset. Use /start.", reply_markup=MAIN_MENU_KB)
         return
+    msg = (update.message.text or "").strip()
+    await handler(update, context, get_handle(update), msg, context.user_data.get("tmp", {}))
 
-    if awaiting == "REG_NAME":
-        tmp["full_name"] = msg
-        context.user_data["tmp"] = tmp
-        context.user_data["awaiting"] = "REG_PHONE"
-        await update.message.reply_text("Type phone number (or '-' to skip):", reply_markup=main_menu_keyboard())
+async def wiz_admin_password(update: Update, context: ContextTypes.DEFAULT_TYPE, handle: str, msg: str, tmp: dict) -> None:
+    reply = update.message.reply_text
+    chat_id = update.effective_chat.id
+    if msg == ADMIN_PASSWORD:
+        await run_db(user_grant_admin, handle, chat_id)
+        context.user_data.clear()
+        await reply("Admin access granted. Tap Admin Panel.", reply_markup=MAIN_MENU_KB)
+    else:
+        context.user_data.clear()
+        await reply("Wrong password.", reply_markup=MAIN_MENU_KB)
+
+async def wiz_reg_name(update: Update, context: ContextTypes.DEFAULT_TYPE, handle: str, msg: str, tmp: dict) -> None:
+    reply = update.message.reply_text
+    tmp["full_name"] = msg
+    context.user_data["tmp"] = tmp
+    context.user_data["awaiting"] = "REG_PHONE"
+    await reply("Type phone number (or '-' to skip):", reply_markup=MAIN_MENU_KB)
+
+async def wiz_adm_attend_id(update: Update, context: ContextTypes.DEFAULT_TYPE, handle: str, msg: str, tmp: dict) -> None:
+    reply = update.message.reply_text
+    act_id = parse_act_id(msg)
+    if act_id is None:
+        await reply(MSG_BAD_ACT_ID)
         return
 
-    if awaiting == "ADM_ATTEND_ID":
-        if not msg.isdigit():
-            await update.message.reply_text("Enter a numeric activity id (e.g., 1).")
-            return
-
-        act_id = int(msg)
-        act = activity_get(act_id)
-        if not act:
-            context.user_data.clear()
-            await update.message.reply_text("Activity not found.", reply_markup=main_menu_keyboard())
-            return
-
-        rows = admin_attendance_list(act_id)
-        title = act[1]
-        s = fmt_dt(int(act[4]))
-        e = fmt_time(int(act[5]))
-
-        if not rows:
-            context.user_data.clear()
-            await update.message.reply_text(
-                f"Attendance list for #{act_id} {title}\n🕒 {s}-{e}\n\n(no attendees yet)",
-                reply_markup=main_menu_keyboard()
-            )
-            return
+    act, rows = await run_db(admin_attendance_list, act_id)
+    if not act:
+        context.user_data.clear()
+        await reply("Activity not found.", reply_markup=MAIN_MENU_KB)
+        return
 
-        lines = [f"Attendance list for #{act_id} {title}", f"🕒 {s}-{e}", ""]
-        for name, ind_h, cg_h, cg_status, booked_by, created_ts in rows:
-            cg_part = ""
-            if cg_h:
-                cg_part = f" | caregiver @{cg_h} ({cg_status})"
-            lines.append(f"- {name} (@{ind_h}){cg_part}")
+    title = act["title"]
+    span = fmt_span(act["start_ts"], act["end_ts"])
 
+    if not rows:
         context.user_data.clear()
-        await update.message.reply_text("\n".join(lines), reply_markup=main_menu_keyboard())
+        await reply(
+            f"Attendance list for #{act_id} {title}\n🕒 {span}\n\n(no attendees yet)",
+            reply_markup=MAIN_MENU_KB
+        )
         return
 
-    
-    if awaiting == "REG_PHONE":
-        phone = "" if msg == "-" else msg
-        role = tmp.get("role", "individual")
-        full_name = tmp.get("full_name", handle)
+    lines = [f"Attendance list for #{act_id} {title}", f"🕒 {span}", ""]
+    lines.extend(
+        f"- {r['name']} (@{r['individual_handle']}){caregiver_part(r['caregiver_handle'], r['caregiver_status'])}"
+        for r in rows
+    )
 
-        user_upsert(handle, role, full_name, phone, chat_id)
+    context.user_data.clear()
+    await reply_lines(update, lines, reply_markup=MAIN_MENU_KB)
 
-        if role == "individual":
-            ensure_self_individual_profile(handle, full_name)
-            context.user_data.clear()
-            await update.message.reply_text("Registration complete.", reply_markup=main_menu_keyboard())
-            return
+async def wiz_reg_phone(update: Update, context: ContextTypes.DEFAULT_TYPE, handle: str, msg: str, tmp: dict) -> None:
+    reply = update.message.reply_text
+    chat_id = update.effective_chat.id
+    phone = "" if msg == "-" else msg
+    role = tmp.get("role", "individual")
+    full_name = tmp.get("full_name", handle)
 
-        if role == "caregiver":
-            context.user_data["awaiting"] = "CG_FIRST_NAME"
-            context.user_data["tmp"] = {"role": role, "full_name": full_name, "phone": phone}
-            await update.message.reply_text("Caregiver setup: What is the individual's name under your care?", reply_markup=main_menu_keyboard())
-            return
+    await run_db(user_upsert, handle, role, full_name, phone, chat_id, role == "individual")
 
-    if awaiting == "CG_FIRST_NAME":
-        tmp["ind_name"] = msg
-        context.user_data["tmp"] = tmp
-        context.user_data["awaiting"] = "CG_FIRST_HANDLE"
-        await update.message.reply_text("What is the individual's Telegram handle? (e.g., @john123)")
+    if role == "individual":
+        context.user_data.clear()
+        await reply("Registration complete.", reply_markup=MAIN_MENU_KB)
         return
 
-    if awaiting == "CG_FIRST_HANDLE":
-        ind_handle = norm_handle(msg)
-        ind_name = tmp.get("ind_name", "Individual")
-        individual_profile_upsert(ind_handle, ind_name)
-        caregiver_link_add(handle, ind_handle)
-        context.user_data.clear()
-        await update.message.reply_text(
-            f"Caregiver registration complete.\nLinked individual: {ind_name} (@{ind_handle}).\n\nTo add more later: /add_individual",
-            reply_markup=main_menu_keyboard(),
-        )
+    if role == "caregiver":
+        context.user_data["awaiting"] = "CG_FIRST_NAME"
+        context.user_data["tmp"] = {"role": role, "full_name": full_name, "phone": phone}
+        await reply("Caregiver setup: What is the individual's name under your care?", reply_markup=MAIN_MENU_KB)
         return
 
-    if awaiting == "CANCEL_ACT_ID":
-        u = user_get(handle)
-        if not u or u[1] != "individual":
-            context.user_data.clear()
-            await update.message.reply_text("Cancel is for individuals only.", reply_markup=main_menu_keyboard())
-            return
-        if not msg.isdigit():
-            await update.message.reply_text("Enter a numeric activity id (e.g., 1).")
-            return
-        act_id = int(msg)
-        ind_handle = ensure_self_individual_profile(handle, u[2] or handle)
-        ok = cancel_booking(act_id, ind_handle)
+async def wiz_cg_first_name(update: Update, context: ContextTypes.DEFAULT_TYPE, handle: str, msg: str, tmp: dict) -> None:
+    reply = update.message.reply_text
+    tmp["ind_name"] = msg
+    context.user_data["tmp"] = tmp
+    context.user_data["awaiting"] = "CG_FIRST_HANDLE"
+    await reply("What is the individual's Telegram handle? (e.g., @john123)")
+
+async def wiz_cg_first_handle(update: Update, context: ContextTypes.DEFAULT_TYPE, handle: str, msg: str, tmp: dict) -> None:
+    reply = update.message.reply_text
+    ind_handle = norm_handle(msg)
+    ind_name = tmp.get("ind_name", "Individual")
+    await run_db(caregiver_link_add, handle, ind_handle, ind_name)
+    context.user_data.clear()
+    await reply(
+        f"Caregiver registration complete.\nLinked individual: {ind_name} (@{ind_handle}).\n\nTo add more later: /add_individual",
+        reply_markup=MAIN_MENU_KB,
+    )
+
+async def wiz_cancel_act_id(update: Update, context: ContextTypes.DEFAULT_TYPE, handle: str, msg: str, tmp: dict) -> None:
+    reply = update.message.reply_text
+    u = await user_get_cached(handle)
+    if not u or u["role"] != "individual":
         context.user_data.clear()
-        await update.message.reply_text("Cancelled." if ok else "No such booking.", reply_markup=main_menu_keyboard())
+        await reply("Cancel is for individuals only.", reply_markup=MAIN_MENU_KB)
         return
-
-    if awaiting == "ADM_TITLE":
-        tmp["title"] = msg
-        context.user_data["tmp"] = tmp
-        context.user_data["awaiting"] = "ADM_DESC"
-        await update.message.reply_text("Description:")
+    act_id = parse_act_id(msg)
+    if act_id is None:
+        await reply(MSG_BAD_ACT_ID)
         return
-
-    if awaiting == "ADM_DESC":
-        tmp["description"] = msg
-        context.user_data["tmp"] = tmp
-        context.user_data["awaiting"] = "ADM_LOC"
-        await update.message.reply_text("Location:")
+    # An individual's bookings are keyed by their own handle; no profile row means no booking.
+    ok = await run_db(cancel_booking, act_id, handle)
+    context.user_data.clear()
+    await reply("Cancelled." if ok else "No such booking.", reply_markup=MAIN_MENU_KB)
+
+async def wiz_adm_title(update: Update, context: ContextTypes.DEFAULT_TYPE, handle: str, msg: str, tmp: dict) -> None:
+    reply = update.message.reply_text
+    tmp["title"] = msg
+    context.user_data["tmp"] = tmp
+    context.user_data["awaiting"] = "ADM_DESC"
+    await reply("Description:")
+
+async def wiz_adm_desc(update: Update, context: ContextTypes.DEFAULT_TYPE, handle: str, msg: str, tmp: dict) -> None:
+    reply = update.message.reply_text
+    tmp["description"] = msg
+    context.user_data["tmp"] = tmp
+    context.user_data["awaiting"] = "ADM_LOC"
+    await reply("Location:")
+
+async def wiz_adm_loc(update: Update, context: ContextTypes.DEFAULT_TYPE, handle: str, msg: str, tmp: dict) -> None:
+    reply = update.message.reply_text
+    tmp["location"] = msg
+    context.user_data["tmp"] = tmp
+    context.user_data["awaiting"] = "ADM_START"
+    await reply("Start datetime (YYYY-MM-DD HH:MM):")
+
+async def wiz_adm_start(update: Update, context: ContextTypes.DEFAULT_TYPE, handle: str, msg: str, tmp: dict) -> None:
+    reply = update.message.reply_text
+    ts = parse_local_dt(msg)
+    if ts is None:
+        await reply(MSG_BAD_DATETIME)
         return
-
-    if awaiting == "ADM_LOC":
-        tmp["location"] = msg
-        context.user_data["tmp"] = tmp
-        context.user_data["awaiting"] = "ADM_START"
-        await update.message.reply_text("Start datetime (YYYY-MM-DD HH:MM):")
+    tmp["start_ts"] = ts
+    context.user_data["tmp"] = tmp
+    context.user_data["awaiting"] = "ADM_END"
+    await reply("End datetime (YYYY-MM-DD HH:MM):")
+
+async def wiz_adm_end(update: Update, context: ContextTypes.DEFAULT_TYPE, handle: str, msg: str, tmp: dict) -> None:
+    reply = update.message.reply_text
+    ts = parse_local_dt(msg)
+    if ts is None:
+        await reply(MSG_BAD_DATETIME)
         return
-
-    if awaiting == "ADM_START":
-        ts = parse_local_dt(msg)
-        if ts is None:
-            await update.message.reply_text("Invalid format. Use YYYY-MM-DD HH:MM")
-            return
-        tmp["start_ts"] = ts
-        context.user_data["tmp"] = tmp
-        context.user_data["awaiting"] = "ADM_END"
-        await update.message.reply_text("End datetime (YYYY-MM-DD HH:MM):")
+    if ts <= tmp["start_ts"]:
+        await reply("End must be after start. Enter end datetime again.")
         return
-
-    if awaiting == "ADM_END":
-        ts = parse_local_dt(msg)
-        if ts is None:
-            await update.message.reply_text("Invalid format. Use YYYY-MM-DD HH:MM")
-            return
-        if ts <= int(tmp["start_ts"]):
-            await update.message.reply_text("End must be after start. Enter end datetime again.")
-            return
-        tmp["end_ts"] = ts
-        context.user_data["tmp"] = tmp
-        context.user_data["awaiting"] = "ADM_CAP"
-        await update.message.reply_text("Capacity (positive integer):")
+    tmp["end_ts"] = ts
+    context.user_data["tmp"] = tmp
+    context.user_data["awaiting"] = "ADM_CAP"
+    await reply("Capacity (1-999999):")
+
+async def wiz_adm_cap(update: Update, context: ContextTypes.DEFAULT_TYPE, handle: str, msg: str, tmp: dict) -> None:
+    reply = update.message.reply_text
+    cap = parse_capacity(msg)
+    if cap is None:
+        await reply("Capacity must be a whole number from 1 to 999999.")
         return
+    act_id = await run_db(
+        admin_add_activity,
+        tmp["title"],
+        tmp.get("description", ""),
+        tmp.get("location", ""),
+        tmp["start_ts"],
+        tmp["end_ts"],
+        cap,
+    )
+    context.user_data.clear()
+    await reply(f"Event created: #{act_id}", reply_markup=MAIN_MENU_KB)
 
-    if awaiting == "ADM_CAP":
-        if not msg.isdigit() or int(msg) <= 0:
-            await update.message.reply_text("Capacity must be a positive integer.")
-            return
-        cap = int(msg)
-        act_id = admin_add_activity(
-            tmp["title"],
-            tmp.get("description", ""),
-            tmp.get("location", ""),
-            tmp["start_ts"],
-            tmp["end_ts"],
-            cap,
-        )
+async def wiz_ind_cg_handle(update: Update, context: ContextTypes.DEFAULT_TYPE, handle: str, msg: str, tmp: dict) -> None:
+    reply = update.message.reply_text
+    cg_handle = norm_handle(msg)
+    activity_id = int(tmp["activity_id"])
+    individual_handle = tmp["individual_handle"]
+
+    act = await run_db(update_booking_caregiver, activity_id, individual_handle, cg_handle)
+
+    cg_user = await user_get_cached(cg_handle)
+    if not cg_user or not cg_user["chat_id"]:
         context.user_data.clear()
-        await update.message.reply_text(f"Event created: #{act_id}", reply_markup=main_menu_keyboard())
+        await reply(
+            f"Saved caregiver @{cg_handle} as pending.\n"
+            f"Note: I can only message the caregiver if they have started the bot at least once (/start).",
+            reply_markup=MAIN_MENU_KB,
+        )
         return
 
-    if awaiting == "IND_CG_HANDLE":
-        cg_handle = norm_handle(msg)
-        activity_id = int(tmp["activity_id"])
-        individual_handle = tmp["individual_handle"]
-
-        update_booking_caregiver(activity_id, individual_handle, cg_handle)
-
-        cg_user = user_get(cg_handle)
-        if not cg_user or not cg_user[4]:
-            context.user_data.clear()
-            await update.message.reply_text(
-                f"Saved caregiver @{cg_handle} as pending.\n"
-                f"Note: I can only message the caregiver if they have started the bot at least once (/start).",
-                reply_markup=main_menu_keyboard(),
-            )
-            return
-
-        act = activity_get(activity_id)
-        title = act[1] if act else f"Activity #{activity_id}"
-        s = fmt_dt(act[4]) if act else ""
-        e = fmt_time(act[5]) if act else ""
+    title = act["title"] if act else f"Activity #{activity_id}"
+    span = fmt_span(act["start_ts"], act["end_ts"]) if act else "-"
 
+    # Acknowledge only once the caregiver's prompt is delivered; e.g. Forbidden if they blocked the bot.
+    context.user_data.clear()
+    try:
         await context.bot.send_message(
-            chat_id=cg_user[4],
+            chat_id=cg_user["chat_id"],
             text=(
                 f"Attendance confirmation request:\n"
                 f"Individual @{individual_handle} booked: {title}\n"
-                f"🕒 {s}-{e}\n\n"
+                f"🕒 {span}\n\n"
                 f"Will you attend with them?"
             ),
             reply_markup=caregiver_confirm_kb(activity_id, individual_handle),
         )
-
-        context.user_data.clear()
-        await update.message.reply_text("Caregiver notified (pending confirmation).", reply_markup=main_menu_keyboard())
+    except TelegramError:
+        await reply(
+            f"Saved caregiver @{cg_handle} as pending, but I could not message them.\n"
+            f"Ask them to /start the bot (and unblock it if needed).",
+            reply_markup=MAIN_MENU_KB,
+        )
         return
-
-    context.user_data.clear()
-    await update.message.reply_text("Flow reset. Use /start.", reply_markup=main_menu_keyboard())
+    await reply("Caregiver notified (pending confirmation).", reply_markup=MAIN_MENU_KB)
+
+# context.user_data["awaiting"] names the wizard step; one dict lookup picks its handler.
+WIZARD_HANDLERS = {
+    "ADMIN_PASSWORD": wiz_admin_password,
+    "REG_NAME": wiz_reg_name,
+    "ADM_ATTEND_ID": wiz_adm_attend_id,
+    "REG_PHONE": wiz_reg_phone,
+    "CG_FIRST_NAME": wiz_cg_first_name,
+    "CG_FIRST_HANDLE": wiz_cg_first_handle,
+    "CANCEL_ACT_ID": wiz_cancel_act_id,
+    "ADM_TITLE": wiz_adm_title,
+    "ADM_DESC": wiz_adm_desc,
+    "ADM_LOC": wiz_adm_loc,
+    "ADM_START": wiz_adm_start,
+    "ADM_END": wiz_adm_end,
+    "ADM_CAP": wiz_adm_cap,
+    "IND_CG_HANDLE": wiz_ind_cg_handle,
+}
 
 async def inline_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     q = update.callback_query
     await q.answer()
     handle = get_handle(update)
     if not handle:
-        await q.edit_message_text("Set a Telegram username first.")
+        await edit_text(q, "Set a Telegram username first.")
         return
 
     data = q.data or ""
     parts = data.split("|")
-    action = parts[0]
-
-    if action == "ACTLIST":
-        acts = list_activities()
-        if not acts:
-            await q.edit_message_text("No activities available.")
-            return
-        await q.edit_message_text("Select an activity to view details:")
-        await q.message.reply_text("Activities:", reply_markup=activities_name_list_kb(acts))
+    handler = CALLBACK_HANDLERS.get(parts[0])
+    if handler:
+        await handler(q, context, handle, parts)
+
+async def cb_activity_list(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, handle: str, parts: List[str]) -> None:
+    acts = await run_db(list_activities)
+    if not acts:
+        await edit_text(q, "No activities available.")
         return
+    await edit_text(q, "Select an activity to view details:", reply_markup=activities_menu_kb(acts))
 
-    if action == "ACT":
-        act_id = int(parts[1])
-        act = activity_get(act_id)
-        if not act:
-            await q.edit_message_text("Activity not found.")
-            return
-        _, title, desc, loc, s, e, cap, booked = act
-        text = (
-            f"#{act_id} — {title}\n"
-            f"🕒 {fmt_dt(int(s))}–{fmt_time(int(e))}\n"
-            f"📍 {loc or '-'}\n"
-            f"📝 {desc or '-'}\n"
-            f"👥 {booked}/{cap}"
-        )
-        await q.edit_message_text(text, reply_markup=activity_detail_kb(act_id))
+async def cb_activity(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, handle: str, parts: List[str]) -> None:
+    act_id = int(parts[1])
+    act = await run_db(activity_get, act_id)
+    if not act:
+        await edit_text(q, "Activity not found.")
         return
+    await edit_text(q, fmt_activity_detail(act), reply_markup=activity_detail_kb(act_id))
 
-    if action == "ADM_MONTHS":
-        cmd = parts[1] if len(parts) > 1 else "LIST"
-        if cmd in ("LIST", "BACK"):
-            keys = list_upcoming_month_keys()
-            if not keys:
-                await q.edit_message_text("No upcoming events.")
-                return
-            await q.edit_message_text("Select a month:")
-            await q.message.reply_text("Months:", reply_markup=admin_months_kb(keys))
-            return
-
-    if action == "ADM_MONTH":
-        month = parts[1]
-        acts = activities_in_month(month)
-        if not acts:
-            await q.edit_message_text(f"No events for {month_label(month)}.", reply_markup=admin_back_to_months_kb())
+async def cb_admin_months(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, handle: str, parts: List[str]) -> None:
+    cmd = parts[1] if len(parts) > 1 else "LIST"
+    if cmd in ("LIST", "BACK"):
+        keys = await run_db(list_upcoming_month_keys)
+        if not keys:
+            await edit_text(q, "No upcoming events.")
             return
+        await edit_text(q, "Select a month:", reply_markup=admin_months_kb(keys))
 
-        lines = [f"Events in {month_label(month)}:"]
-        for a in acts:
-            act_id, title, _, loc, s, e, cap, booked = a
-            lines.append(
-                f"- #{act_id} {title} | {fmt_dt(int(s))}-{fmt_time(int(e))} | {loc or '-'} | {booked}/{cap}"
-            )
-        await q.edit_message_text("\n".join(lines), reply_markup=admin_back_to_months_kb())
+async def cb_admin_month(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, handle: str, parts: List[str]) -> None:
+    month = parts[1]
+    acts = await run_db(activities_in_month, month)
+    if not acts:
+        await edit_text(q, f"No events for {month_label(month)}.", reply_markup=ADMIN_BACK_TO_MONTHS_KB)
         return
 
-    if action == "BOOK":
-        act_id = int(parts[1])
-        u = user_get(handle)
-        if not u:
-            await q.edit_message_text("Register first (tap Register).")
-            return
-
-        role = u[1]
-        if role == "individual":
-            ind_handle = ensure_self_individual_profile(handle, u[2] or handle)
-            ok, msg = create_booking(act_id, ind_handle, handle, None, None)
-            if not ok:
-                await q.edit_message_text(msg)
-                return
-
-            context.user_data["tmp"] = {"activity_id": act_id, "individual_handle": ind_handle}
-            await q.edit_message_text("Will your caregiver be joining?", reply_markup=yesno_kb("INDCG"))
-            return
-
-        if role == "caregiver":
-            people = caregiver_linked_individuals(handle)
-            if not people:
-                await q.edit_message_text("No linked individuals. Use /add_individual first.")
-                return
-            await q.edit_message_text(
-                "Select individual to book for:\n(Caregiver will be automatically included as attending.)",
-                reply_markup=caregiver_pick_individual_kb(handle, act_id),
-            )
-            return
-
-        await q.edit_message_text("Admins cannot book as users.")
+    lines = [f"Events in {month_label(month)}:"]
+    lines.extend(
+        f"- #{a['id']} {a['title']} | {fmt_span(a['start_ts'], a['end_ts'])} | "
+        f"{a['location'] or '-'} | {a['booked_count']}/{a['capacity']}"
+        for a in acts
+    )
+    await edit_text(q, "\n".join(lines), reply_markup=ADMIN_BACK_TO_MONTHS_KB)
+
+async def cb_book(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, handle: str, parts: List[str]) -> None:
+    act_id = int(parts[1])
+    u = await user_get_cached(handle)
+    if not u:
+        await edit_text(q, MSG_REGISTER_FIRST_TAP)
         return
 
-    if action == "INDCG":
-        yn = parts[1]
-        if yn == "NO":
-            context.user_data.clear()
-            await q.edit_message_text("Booked (no caregiver).")
+    role = u["role"]
+    if role == "individual":
+        ind_handle = await run_db(ensure_self_individual_profile, handle, u["full_name"] or handle)
+        ok, msg = await run_db(create_booking, act_id, ind_handle, handle, None, None)
+        if not ok:
+            await edit_text(q, msg)
             return
-        context.user_data["awaiting"] = "IND_CG_HANDLE"
-        await q.edit_message_text("Type your caregiver’s Telegram handle (e.g., @caregiver123):")
-        return
 
-    # ✅ CHANGE HERE: caregiver auto-tagged as attending (confirmed)
-    if action == "CGBOOK":
-        act_id = int(parts[1])
-        ind_handle = norm_handle(parts[2])
+        context.user_data["tmp"] = {"activity_id": act_id, "individual_handle": ind_handle}
+        await edit_text(q, "Will your caregiver be joining?", reply_markup=INDCG_YESNO_KB)
+        return
 
-        linked = {h for h, _ in caregiver_linked_individuals(handle)}
-        if ind_handle not in linked:
-            await q.edit_message_text("You can only book for individuals linked to your caregiver account.")
+    if role == "caregiver":
+        people = await run_db(caregiver_linked_individuals, handle)
+        if not people:
+            await edit_text(q, "No linked individuals. Use /add_individual first.")
             return
-
-        ok, msg = create_booking(
-            activity_id=act_id,
-            individual_handle=ind_handle,
-            booked_by=handle,
-            caregiver_handle=handle,          # caregiver automatically attached
-            caregiver_status="confirmed",     # and confirmed
+        await edit_text(
+            q,
+            "Select individual to book for:\n(Caregiver will be automatically included as attending.)",
+            reply_markup=caregiver_pick_individual_kb(people, act_id),
         )
-        if ok:
-            await q.edit_message_text("Booked successfully. Caregiver is included as attending ✅")
-        else:
-            await q.edit_message_text(msg)
         return
 
-    if action == "CGCONF":
-        act_id = int(parts[1])
-        ind_handle = norm_handle(parts[2])
-        yn = parts[3]
-        status = "confirmed" if yn == "YES" else "declined"
-        update_caregiver_status(act_id, ind_handle, handle, status)
-        await q.edit_message_text("Recorded: " + ("Confirmed ✅" if status == "confirmed" else "Declined ❌"))
+    await edit_text(q, "Admins cannot book as users.")
+
+async def cb_individual_caregiver(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, handle: str, parts: List[str]) -> None:
+    yn = parts[1]
+    if yn == "NO":
+        context.user_data.clear()
+        await edit_text(q, "Booked (no caregiver).")
         return
+    context.user_data["awaiting"] = "IND_CG_HANDLE"
+    await edit_text(q, "Type your caregiver’s Telegram handle (e.g., @caregiver123):")
+
+# ✅ CHANGE HERE: caregiver auto-tagged as attending (confirmed)
+async def cb_caregiver_book(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, handle: str, parts: List[str]) -> None:
+    act_id = int(parts[1])
+    ind_handle = norm_handle(parts[2])
+
+    ok, msg = await run_db(caregiver_create_booking, act_id, ind_handle, handle)
+    if ok:
+        await edit_text(q, "Booked successfully. Caregiver is included as attending ✅")
+    else:
+        await edit_text(q, msg)
+
+async def cb_caregiver_confirm(q: CallbackQuery, context: ContextTypes.DEFAULT_TYPE, handle: str, parts: List[str]) -> None:
+    act_id = int(parts[1])
+    ind_handle = norm_handle(parts[2])
+    yn = parts[3]
+    status = "confirmed" if yn == "YES" else "declined"
+    await run_db(update_caregiver_status, act_id, ind_handle, handle, status)
+    await edit_text(q, "Recorded: " + ("Confirmed ✅" if status == "confirmed" else "Declined ❌"))
+
+# callback_data is "ACTION|arg|..."; one dict lookup picks the handler.
+CALLBACK_HANDLERS = {
+    "ACTLIST": cb_activity_list,
+    "ACT": cb_activity,
+    "ADM_MONTHS": cb_admin_months,
+    "ADM_MONTH": cb_admin_month,
+    "BOOK": cb_book,
+    "INDCG": cb_individual_caregiver,
+    "CGBOOK": cb_caregiver_book,
+    "CGCONF": cb_caregiver_confirm,
+}
 
 # ------------------------
 # Commands
 # ------------------------
 
 async def add_individual_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    reply = update.message.reply_text
     handle = get_handle(update)
     if not handle:
-        await update.message.reply_text("Set a Telegram username first.")
+        await reply("Set a Telegram username first.")
         return
-    u = user_get(handle)
-    if not u or u[1] != "caregiver":
-        await update.message.reply_text("This command is for caregivers only.", reply_markup=main_menu_keyboard())
+    if await user_role_cached(handle) != "caregiver":
+        await reply("This command is for caregivers only.", reply_markup=MAIN_MENU_KB)
         return
     context.user_data["awaiting"] = "ADDIND_NAME"
     context.user_data["tmp"] = {}
-    await update.message.reply_text("New individual: what is their name?", reply_markup=main_menu_keyboard())
+    await reply("New individual: what is their name?", reply_markup=MAIN_MENU_KB)
 
 # ------------------------
 # App
 # ------------------------
 
 def build_app(token: str) -> Application:
-    app = Application.builder().token(token).build()
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(CommandHandler("add_individual", add_individual_cmd))
-    app.add_handler(CallbackQueryHandler(inline_callback))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
+    app = Application.builder().token(token).concurrent_updates(True).build()
+    # Every flow is one-to-one (phone numbers, admin password), so group chats are filtered out
+    # before any handler callback runs. Edits are ignored too: re-sending an edited "1" must not
+    # replay a wizard step, and it guarantees update.message is set in the handlers.
+    private = filters.ChatType.PRIVATE & filters.UpdateType.MESSAGE
+    app.add_handlers([
+        CommandHandler("start", start, filters=private, block=False),
+        CommandHandler("add_individual", add_individual_cmd, filters=private, block=False),
+        CallbackQueryHandler(inline_callback, block=False),
+        MessageHandler(private & filters.TEXT & ~filters.COMMAND, handle_text, block=False),
+    ])
     return app
 
 def main() -> None:
@@ -1042,8 +1520,19 @@ def main() -> None:
         raise RuntimeError("BOT_TOKEN env var is missing.")
     init_db()
     seed_demo_activities_if_empty()
+    # uvloop is optional (not available on Windows); the default asyncio loop works the same, just slower.
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+    except ImportError:
+        pass
     app = build_app(token)
-    app.run_polling(close_loop=False)
+    # Long-poll: Telegram holds getUpdates open up to 30s instead of answering empty every 10s.
+    # bootstrap_retries=-1 keeps retrying startup through a network blip instead of exiting.
+    try:
+        app.run_polling(close_loop=False, poll_interval=0.0, timeout=30, bootstrap_retries=-1)
+    finally:
+        close_db()
 
 if __name__ == "__main__":
     main()